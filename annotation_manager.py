@@ -1,124 +1,650 @@
-import json
+import bisect
+import functools
+import hashlib
+import io
+import itertools
+import logging
+import mmap
 import os
 import re
+import tempfile
+import orjson
+from collections import OrderedDict
 from datetime import datetime
 from typing import Dict, List, Any
+from utils import get_color_options
+
+try:
+    import ahocorasick
+except ImportError:  # optional accelerator, see the "fast" extra
+    ahocorasick = None
+
+logger = logging.getLogger(__name__)
+
+
+def _read_json(path: str) -> Any:
+    """Parse a JSON file straight from a read-only memory map"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        # mmap refuses zero-length files
+        if os.fstat(fd).st_size == 0:
+            return {}
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return orjson.loads(view)
+    finally:
+        os.close(fd)
+
+
+_SANITIZE_RE = re.compile(r'[^\w\-_.]')
+
+# Event logs are folded back into the base JSON file once they grow past this
+LOG_COMPACT_BYTES = 64 * 1024
+
+ANNOTATION_KINDS = ('highlights', 'comments', 'notes')
+
+# Fields folded into each annotation's lowercased search blob
+SEARCH_FIELDS = {
+    'highlights': ('text',),
+    'comments': ('text', 'comment'),
+    'notes': ('text', 'note', 'topic'),
+}
+
+# Highlight color name -> <mark> background
+HIGHLIGHT_COLOR_MAP = {name: option['hex'] for name, option in get_color_options().items()}
+
+# Record key under which earlier versions kept the longest-first highlight
+# list; still stripped on save in case an old export is re-imported
+SORTED_HIGHLIGHTS_KEY = '_highlights_sorted_desc_len'
+
+# How many highlight lists keep a cached longest-first copy
+SORTED_HIGHLIGHTS_CACHE_SIZE = 32
+
+# Per-annotation fields recomputable from the annotation itself. They are
+# kept out of the files so loads parse each selection's text only once;
+# both keys are only found in files written by older versions.
+DERIVED_ITEM_KEYS = ('_search_blob', 'text_preview')
+
+# Above this many annotations a search scans one joined haystack with str.find
+SEARCH_HAYSTACK_MIN_ITEMS = 256
+
+
+@functools.lru_cache(maxsize=256)
+def _data_file_path(directory: str, pdf_name: str, suffix: str) -> str:
+    """Build the sanitized per-PDF JSON path, once per (directory, name)"""
+    clean_name = _SANITIZE_RE.sub('_', pdf_name)
+    return os.path.join(directory, f"{clean_name}_{suffix}.json")
+
+
+def _highlight_sort_key(highlight: Dict[str, Any]) -> int:
+    return -len(highlight['text'])
+
+
+def _stored_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """An annotation as written to disk, without fields derived from its text"""
+    if any(key in item for key in DERIVED_ITEM_KEYS):
+        return {k: v for k, v in item.items() if k not in DERIVED_ITEM_KEYS}
+    return item
+
+
+def _without_derived(annotations: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of an annotations dict minus in-memory-only and derived data"""
+    stored = {}
+    for name, entry in annotations.items():
+        if isinstance(entry, dict):
+            entry = {k: v for k, v in entry.items() if k != SORTED_HIGHLIGHTS_KEY}
+            for kind in ANNOTATION_KINDS:
+                if kind in entry:
+                    entry[kind] = [_stored_item(item) for item in entry[kind]]
+        stored[name] = entry
+    return stored
+
+
+def _search_blob(kind: str, item: Dict[str, Any]) -> str:
+    """Lowercased concatenation of an item's searchable fields"""
+    return '\x1f'.join(item.get(field, '') for field in SEARCH_FIELDS[kind]).lower()
+
+
+def _search_entry(blobs: List[str]):
+    """Blobs of one annotation kind, joined into a haystack once there are enough of them"""
+    if len(blobs) < SEARCH_HAYSTACK_MIN_ITEMS:
+        return blobs, None, None
+    # starts[i] is where blob i begins in the haystack
+    starts = list(itertools.accumulate((len(blob) + 1 for blob in blobs), initial=0))
+    return blobs, '\x1e'.join(blobs), starts
+
+
+def _matching_items(items: List[Dict[str, Any]], search_entry, query_lower: str) -> List[Dict[str, Any]]:
+    """Return the items whose search blob contains query_lower"""
+    blobs, haystack, starts = search_entry
+    if haystack is None:
+        matches = [item for item, blob in zip(items, blobs) if query_lower in blob]
+    else:
+        # One C-level scan over all blobs
+        matches = []
+        pos = haystack.find(query_lower)
+        while pos != -1:
+            i = bisect.bisect_right(starts, pos) - 1
+            matches.append(items[i])
+            pos = haystack.find(query_lower, starts[i + 1])
+    
+    # Files written by older versions may still carry stored blobs
+    for item in matches:
+        item.pop('_search_blob', None)
+    return matches
+
+
+def _log_path(path: str) -> str:
+    """Get the append-only event log that sits next to a JSON file"""
+    return f"{path}.log"
+
+
+def _file_stamp(path: str):
+    """Return (mtime_ns, size) for a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _new_pdf_entry() -> Dict[str, Any]:
+    """Create the empty annotation record for a PDF"""
+    return {
+        'highlights': [],
+        'comments': [],
+        'notes': [],
+        'counts': {kind: 0 for kind in ANNOTATION_KINDS},
+        'last_modified': None,
+        '_counters': {kind: 0 for kind in ANNOTATION_KINDS},
+        '_ids_increasing': True
+    }
+
+
+def _ensure_counters(pdf_annotations: Dict[str, Any]) -> Dict[str, int]:
+    """Get a record's id counters, seeding them from the highest ids for older records"""
+    counters = pdf_annotations.get('_counters')
+    if counters is None:
+        counters = pdf_annotations['_counters'] = {
+            k: max((item.get('id', 0) for item in pdf_annotations.get(k, [])), default=0)
+            for k in ANNOTATION_KINDS
+        }
+    return counters
+
+
+def _next_id(pdf_annotations: Dict[str, Any], kind: str) -> int:
+    """Hand out the next id for a kind; ids are never reused after a delete"""
+    counters = _ensure_counters(pdf_annotations)
+    counters[kind] += 1
+    return counters[kind]
+
+
+def _insert_annotation(pdf_annotations: Dict[str, Any], kind: str, item: Dict[str, Any]) -> None:
+    """Append an annotation, keeping the record's counts and last_modified current"""
+    items = pdf_annotations.setdefault(kind, [])
+    items.append(item)
+    
+    counts = pdf_annotations.get('counts')
+    if counts is None:
+        # Records saved before counts were tracked
+        pdf_annotations['counts'] = {k: len(pdf_annotations.get(k, [])) for k in ANNOTATION_KINDS}
+    else:
+        counts[kind] = len(items)
+    
+    counters = pdf_annotations.get('_counters')
+    if counters is not None and item.get('id', 0) > counters.get(kind, 0):
+        # Replayed events carry ids the counter has not seen yet
+        counters[kind] = item['id']
+    
+    timestamp = item.get('timestamp')
+    if timestamp and timestamp > (pdf_annotations.get('last_modified') or ''):
+        pdf_annotations['last_modified'] = timestamp
+
+
+def _latest_timestamp(pdf_annotations: Dict[str, Any]):
+    """Scan every annotation for the newest timestamp"""
+    return max(
+        (item['timestamp']
+         for kind in ANNOTATION_KINDS
+         for item in pdf_annotations.get(kind, [])
+         if 'timestamp' in item),
+        default=None
+    )
+
+
+def _refresh_after_remove(pdf_annotations: Dict[str, Any], kind: str) -> None:
+    """Bring a record's count and last_modified up to date after entries were removed"""
+    if 'counts' in pdf_annotations:
+        pdf_annotations['counts'][kind] = len(pdf_annotations[kind])
+    if 'last_modified' in pdf_annotations:
+        # The removed entry may have been the newest one
+        pdf_annotations['last_modified'] = _latest_timestamp(pdf_annotations)
+
+
+def _new_topic(name: str, created: str) -> Dict[str, Any]:
+    """Create the empty record for a topic"""
+    return {
+        'name': name,
+        'created': created,
+        'notes': [],
+        'highlights': [],
+        'comments': []
+    }
+
+
+def _annotation_id(annotation: Dict[str, Any]) -> int:
+    return annotation.get('id', 0)
+
+
+def _remove_by_id(pdf_annotations: Dict[str, Any], kind: str, annotation_id: int) -> int:
+    """Delete every entry of a kind with the given id in place and return how many were removed.
+
+    Records created with per-PDF counters have strictly increasing ids, so
+    their single match is found with a binary search. Older records can hold
+    duplicate, out-of-order ids from the len+1 scheme and are filtered.
+    """
+    annotations_list = pdf_annotations.get(kind, [])
+    if pdf_annotations.get('_ids_increasing'):
+        i = bisect.bisect_left(annotations_list, annotation_id, key=_annotation_id)
+        if i < len(annotations_list) and _annotation_id(annotations_list[i]) == annotation_id:
+            del annotations_list[i]
+            return 1
+        return 0
+    before = len(annotations_list)
+    annotations_list[:] = [ann for ann in annotations_list if ann.get('id') != annotation_id]
+    return before - len(annotations_list)
+
+
+def _event_key(kind: str, payload: Dict[str, Any]) -> tuple:
+    """Identity of a logged item, used to skip events already in the base file"""
+    if kind == 'topic_note':
+        note = payload['note']
+        return (kind, payload['topic'], note.get('note_id'), note.get('timestamp'))
+    return (kind, payload.get('id'), payload.get('timestamp'))
+
+
+def _existing_event_keys(data: Dict[str, Any], pdf_name) -> set:
+    """Collect the event keys of everything already present in a base file"""
+    if pdf_name is None:
+        return {
+            _event_key('topic_note', {'topic': topic_name, 'note': note})
+            for topic_name, topic_data in data.items()
+            for note in topic_data.get('notes', [])
+        }
+    pdf_annotations = data.get(pdf_name, {})
+    return {
+        _event_key(kind, item)
+        for kind in ANNOTATION_KINDS
+        for item in pdf_annotations.get(kind, [])
+    }
+
+
+def _apply_event(data: Dict[str, Any], pdf_name, kind: str, payload: Dict[str, Any]) -> None:
+    """Apply one logged event to a loaded annotations or topics dict"""
+    if kind == 'topic_note':
+        topic = payload['topic']
+        if topic not in data:
+            data[topic] = _new_topic(topic, payload['created'])
+        data[topic]['notes'].append(payload['note'])
+    elif kind in ANNOTATION_KINDS:
+        if pdf_name not in data:
+            data[pdf_name] = _new_pdf_entry()
+        _insert_annotation(data[pdf_name], kind, payload)
+    elif kind == 'del':
+        pdf_annotations = data.get(pdf_name, {})
+        if _remove_by_id(pdf_annotations, payload['type'], payload['id']):
+            _refresh_after_remove(pdf_annotations, payload['type'])
+
+
+def _replay_log(data: Dict[str, Any], pdf_name, log_path: str) -> Dict[str, Any]:
+    """Replay an event log on top of the parsed base file"""
+    with open(log_path, 'rb') as f:
+        lines = f.read().splitlines()
+    
+    # Events already folded into the base (e.g. a compaction interrupted
+    # before the log was removed) are recognised and skipped
+    seen = _existing_event_keys(data, pdf_name)
+    for line in lines:
+        try:
+            event = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            # Torn line from an interrupted append
+            continue
+        if event['k'] != 'del':
+            key = _event_key(event['k'], event['d'])
+            if key in seen:
+                continue
+            seen.add(key)
+        _apply_event(data, pdf_name, event['k'], event['d'])
+    return data
+
+
+@functools.lru_cache(maxsize=128)
+def _load_cached(path: str, pdf_name, base_stamp, log_stamp) -> bytes:
+    """Parse a JSON file and replay its event log once per on-disk version.
+
+    The (mtime, size) stamps of both files are part of the key, so any write
+    misses the cache and stale entries age out of the LRU. The merged state
+    is cached as compact JSON bytes, so every caller parses its own copy and
+    in-memory edits (or a failed append) can never leak into later loads.
+    """
+    data = _read_json(path) if base_stamp is not None else {}
+    if log_stamp is not None:
+        _replay_log(data, pdf_name, _log_path(path))
+    return orjson.dumps(data)
+
+
+def _file_version(path: str):
+    """(base, log) stamps identifying the on-disk state of a data file"""
+    return _file_stamp(path), _file_stamp(_log_path(path))
+
+
+def _load_json(path: str, pdf_name=None, version=None) -> Any:
+    """Load a JSON file plus its event log through the parse cache.
+
+    pdf_name is the key annotation events are replayed under; topics files
+    pass None. version is a _file_version result the caller already holds.
+    """
+    base_stamp, log_stamp = version or _file_version(path)
+    if base_stamp is None and log_stamp is None:
+        return {}
+    return orjson.loads(_load_cached(path, pdf_name, base_stamp, log_stamp))
+
+
+@functools.lru_cache(maxsize=32)
+def _search_index(path: str, pdf_name: str, version) -> Dict[str, tuple]:
+    """Lowercased search blobs of a PDF's annotations, built once per on-disk version.
+
+    Entries line up with the item lists of a _load_json(path, pdf_name,
+    version) result, since both come from the same cached bytes.
+    """
+    pdf_annotations = _load_json(path, pdf_name, version).get(pdf_name, {})
+    return {kind: _search_entry([_search_blob(kind, item) for item in pdf_annotations.get(kind, [])])
+            for kind in ANNOTATION_KINDS}
+
+
+def _mark(text: str, bg_color: str) -> str:
+    """Wrap text in the highlight <mark> tag"""
+    return f'<mark style="background-color: {bg_color}; padding: 2px 4px; border-radius: 3px; margin: 1px;">{text}</mark>'
+
+
+def _find_all(text: str, sub: str):
+    """Yield the start of every occurrence of sub in text, overlapping ones included"""
+    pos = text.find(sub)
+    while pos != -1:
+        yield pos
+        pos = text.find(sub, pos + 1)
+
+
+def _occurrences_single_scan(text: str, highlight_texts) -> Dict[str, List[int]]:
+    """Start offsets of every occurrence of each highlight text, from one Aho-Corasick pass"""
+    automaton = ahocorasick.Automaton()
+    for highlight_text in highlight_texts:
+        automaton.add_word(highlight_text, highlight_text)
+    automaton.make_automaton()
+    
+    occurrences = {}
+    for end_idx, highlight_text in automaton.iter(text):
+        occurrences.setdefault(highlight_text, []).append(end_idx - len(highlight_text) + 1)
+    return occurrences
+
+
+def _claim_spans(candidates) -> List[tuple]:
+    """Choose the span each highlight marks, as (start, end, bg_color) in text order.
+
+    candidates yields (highlight_text, bg_color, start offsets) longest text
+    first; each highlight claims its first occurrence that does not overlap
+    a span already claimed, so shorter ones never nest inside another <mark>.
+    """
+    starts, spans = [], []
+    for highlight_text, bg_color, positions in candidates:
+        for start in positions:
+            end = start + len(highlight_text)
+            i = bisect.bisect_right(starts, start)
+            if i and spans[i - 1][1] > start:
+                continue
+            if i < len(starts) and starts[i] < end:
+                continue
+            starts.insert(i, start)
+            spans.insert(i, (start, end, bg_color))
+            break
+    return spans
+
+
+def _render_marks(text: str, spans: List[tuple]) -> str:
+    """Wrap each claimed span of text in its <mark> tag"""
+    out = io.StringIO()
+    pos = 0
+    for start, end, bg_color in spans:
+        out.write(text[pos:start])
+        out.write(_mark(text[start:end], bg_color))
+        pos = end
+    out.write(text[pos:])
+    return out.getvalue()
+
 
 class AnnotationManager:
     """Manages annotations including highlights, comments, and notes"""
+
+    # path -> (blake2b digest, mtime_ns) of the last bytes this process wrote.
+    # Kept on the class because app.py builds a new manager on every rerun.
+    _written_digests: Dict[str, tuple] = {}
+    
+    # id(highlights list) -> (that list, its longest-first copy). Kept here
+    # rather than in the annotation record so it is never saved or exported.
+    _sorted_highlights_cache: "OrderedDict[int, tuple]" = OrderedDict()
     
     def __init__(self):
         self.annotations_dir = "annotations"
         self.topics_dir = "topics"
         
+    def _save_many(self, files: List[tuple]) -> None:
+        """Atomically replace several JSON files, skipping any whose bytes are unchanged.
+
+        Every temp file is written and fsynced before the first os.replace,
+        so the files are swapped in together after all the I/O succeeded.
+        """
+        pending = []
+        for path, data in files:
+            payload = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+            digest = hashlib.blake2b(payload, digest_size=16).digest()
+            
+            previous = self._written_digests.get(path)
+            if previous is not None and previous[0] == digest:
+                try:
+                    if os.stat(path).st_mtime_ns == previous[1]:
+                        continue
+                except FileNotFoundError:
+                    pass
+            pending.append((path, payload, digest))
+        
+        # Streamlit sessions are threads of one process, so each save needs
+        # its own temp file rather than one named after the pid
+        tmp_paths = []
+        try:
+            for path, payload, _ in pending:
+                directory = os.path.dirname(path)
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+                tmp_paths.append(tmp_path)
+                try:
+                    view = memoryview(payload)
+                    while view:
+                        view = view[os.write(fd, view):]
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                # mkstemp creates the file 0600; keep the usual data file mode
+                os.chmod(tmp_path, 0o644)
+            for (path, _, _), tmp_path in zip(pending, tmp_paths):
+                os.replace(tmp_path, path)
+        except BaseException:
+            for tmp_path in tmp_paths:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            raise
+        
+        _load_cached.cache_clear()
+        _search_index.cache_clear()
+        for path, _, digest in pending:
+            self._written_digests[path] = (digest, os.stat(path).st_mtime_ns)
+    
+    def _append_event(self, path: str, kind: str, payload: Dict[str, Any]) -> int:
+        """Append one event to a file's log and return the log's new size"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        event = {'k': kind, 't': datetime.now().isoformat(), 'd': payload}
+        with open(_log_path(path), 'ab') as f:
+            f.write(orjson.dumps(event) + b"\n")
+            return f.tell()
+    
+    def _discard_log(self, path: str) -> None:
+        """Remove a file's event log once its base file holds the full state"""
+        try:
+            os.remove(_log_path(path))
+        except FileNotFoundError:
+            pass
+        _load_cached.cache_clear()
+        _search_index.cache_clear()
+    
+    def _sorted_highlights(self, highlights: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Get the longest-first copy of a highlight list, rebuilding it if missing or stale"""
+        cache = self._sorted_highlights_cache
+        entry = cache.get(id(highlights))
+        if entry is None or entry[0] is not highlights or len(entry[1]) != len(highlights):
+            entry = cache[id(highlights)] = (highlights, sorted(highlights, key=_highlight_sort_key))
+            if len(cache) > SORTED_HIGHLIGHTS_CACHE_SIZE:
+                cache.popitem(last=False)
+        cache.move_to_end(id(highlights))
+        return entry[1]
+    
+    def _cached_sorted_highlights(self, highlights: List[Dict[str, Any]]):
+        """Return the cached longest-first copy of exactly this list, or None"""
+        entry = self._sorted_highlights_cache.get(id(highlights))
+        if entry is None or entry[0] is not highlights:
+            return None
+        return entry[1]
+    
     def get_annotation_file_path(self, pdf_name: str) -> str:
         """Get the path for annotations file"""
-        clean_name = re.sub(r'[^\w\-_\.]', '_', pdf_name)
-        return os.path.join(self.annotations_dir, f"{clean_name}_annotations.json")
+        return _data_file_path(self.annotations_dir, pdf_name, 'annotations')
     
     def get_topics_file_path(self, pdf_name: str) -> str:
         """Get the path for topics file"""
-        clean_name = re.sub(r'[^\w\-_\.]', '_', pdf_name)
-        return os.path.join(self.topics_dir, f"{clean_name}_topics.json")
+        return _data_file_path(self.topics_dir, pdf_name, 'topics')
     
     def load_annotations(self, pdf_name: str) -> Dict[str, Any]:
         """Load existing annotations for a PDF"""
         try:
             annotations_file = self.get_annotation_file_path(pdf_name)
-            if os.path.exists(annotations_file):
-                with open(annotations_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {}
-        except Exception as e:
-            print(f"Error loading annotations: {e}")
+            return _load_json(annotations_file, pdf_name)
+        except Exception:
+            logger.exception("Error loading annotations")
             return {}
     
     def save_annotations(self, pdf_name: str, annotations: Dict[str, Any]) -> bool:
         """Save annotations for a PDF"""
         try:
             annotations_file = self.get_annotation_file_path(pdf_name)
-            os.makedirs(os.path.dirname(annotations_file), exist_ok=True)
-            
-            with open(annotations_file, 'w', encoding='utf-8') as f:
-                json.dump(annotations, f, indent=2, ensure_ascii=False)
+            self._save_many([(annotations_file, _without_derived(annotations))])
+            self._discard_log(annotations_file)
             return True
-        except Exception as e:
-            print(f"Error saving annotations: {e}")
+        except Exception:
+            logger.exception("Error saving annotations")
             return False
     
     def load_topics(self, pdf_name: str) -> Dict[str, Any]:
         """Load existing topics for a PDF"""
         try:
             topics_file = self.get_topics_file_path(pdf_name)
-            if os.path.exists(topics_file):
-                with open(topics_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {}
-        except Exception as e:
-            print(f"Error loading topics: {e}")
+            return _load_json(topics_file)
+        except Exception:
+            logger.exception("Error loading topics")
             return {}
     
     def save_topics(self, pdf_name: str, topics: Dict[str, Any]) -> bool:
         """Save topics for a PDF"""
         try:
             topics_file = self.get_topics_file_path(pdf_name)
-            os.makedirs(os.path.dirname(topics_file), exist_ok=True)
-            
-            with open(topics_file, 'w', encoding='utf-8') as f:
-                json.dump(topics, f, indent=2, ensure_ascii=False)
+            self._save_many([(topics_file, topics)])
+            self._discard_log(topics_file)
             return True
-        except Exception as e:
-            print(f"Error saving topics: {e}")
+        except Exception:
+            logger.exception("Error saving topics")
             return False
     
+    def save_annotations_and_topics(self, pdf_name: str, annotations: Dict[str, Any],
+                                    topics: Dict[str, Any]) -> bool:
+        """Save annotations and topics for a PDF in one batched write"""
+        try:
+            annotations_file = self.get_annotation_file_path(pdf_name)
+            topics_file = self.get_topics_file_path(pdf_name)
+            self._save_many([
+                (annotations_file, _without_derived(annotations)),
+                (topics_file, topics)
+            ])
+            self._discard_log(annotations_file)
+            self._discard_log(topics_file)
+            return True
+        except Exception:
+            logger.exception("Error saving annotations and topics")
+            return False
+    
+    def compact(self, pdf_name: str) -> bool:
+        """Fold the annotation and topic event logs back into their JSON files"""
+        annotations = self.load_annotations(pdf_name)
+        topics = self.load_topics(pdf_name)
+        return self.save_annotations_and_topics(pdf_name, annotations, topics)
+    
     def add_highlight(self, pdf_name: str, text: str, color: str, annotations: Dict[str, Any]) -> bool:
         """Add a highlight annotation"""
         try:
             if pdf_name not in annotations:
-                annotations[pdf_name] = {
-                    'highlights': [],
-                    'comments': [],
-                    'notes': []
-                }
+                annotations[pdf_name] = _new_pdf_entry()
             
+            stripped_text = text.strip()
             highlight = {
-                'id': len(annotations[pdf_name].get('highlights', [])) + 1,
-                'text': text.strip(),
+                'id': _next_id(annotations[pdf_name], 'highlights'),
+                'text': stripped_text,
                 'color': color,
-                'timestamp': datetime.now().isoformat(),
-                'text_preview': text.strip()[:100] + "..." if len(text.strip()) > 100 else text.strip()
+                'timestamp': datetime.now().isoformat()
             }
             
-            annotations[pdf_name]['highlights'].append(highlight)
-            return self.save_annotations(pdf_name, annotations)
+            _insert_annotation(annotations[pdf_name], 'highlights', highlight)
+            sorted_highlights = self._cached_sorted_highlights(annotations[pdf_name]['highlights'])
+            if sorted_highlights is not None:
+                bisect.insort(sorted_highlights, highlight, key=_highlight_sort_key)
             
-        except Exception as e:
-            print(f"Error adding highlight: {e}")
+            annotations_file = self.get_annotation_file_path(pdf_name)
+            if self._append_event(annotations_file, 'highlights', highlight) > LOG_COMPACT_BYTES:
+                return self.save_annotations(pdf_name, annotations)
+            return True
+            
+        except Exception:
+            logger.exception("Error adding highlight")
             return False
     
     def add_comment(self, pdf_name: str, text: str, comment: str, annotations: Dict[str, Any]) -> bool:
         """Add a comment annotation"""
         try:
             if pdf_name not in annotations:
-                annotations[pdf_name] = {
-                    'highlights': [],
-                    'comments': [],
-                    'notes': []
-                }
+                annotations[pdf_name] = _new_pdf_entry()
             
+            stripped_text = text.strip()
             comment_annotation = {
-                'id': len(annotations[pdf_name].get('comments', [])) + 1,
-                'text': text.strip(),
+                'id': _next_id(annotations[pdf_name], 'comments'),
+                'text': stripped_text,
                 'comment': comment.strip(),
-                'timestamp': datetime.now().isoformat(),
-                'text_preview': text.strip()[:100] + "..." if len(text.strip()) > 100 else text.strip()
+                'timestamp': datetime.now().isoformat()
             }
             
-            annotations[pdf_name]['comments'].append(comment_annotation)
-            return self.save_annotations(pdf_name, annotations)
+            _insert_annotation(annotations[pdf_name], 'comments', comment_annotation)
             
-        except Exception as e:
-            print(f"Error adding comment: {e}")
+            annotations_file = self.get_annotation_file_path(pdf_name)
+            if self._append_event(annotations_file, 'comments', comment_annotation) > LOG_COMPACT_BYTES:
+                return self.save_annotations(pdf_name, annotations)
+            return True
+            
+        except Exception:
+            logger.exception("Error adding comment")
             return False
     
     def add_note(self, pdf_name: str, text: str, note: str, topic: str, 
@@ -127,48 +653,48 @@ class AnnotationManager:
         try:
             # Add to annotations
             if pdf_name not in annotations:
-                annotations[pdf_name] = {
-                    'highlights': [],
-                    'comments': [],
-                    'notes': []
-                }
+                annotations[pdf_name] = _new_pdf_entry()
             
+            stripped_text = text.strip()
+            stripped_note = note.strip()
+            timestamp = datetime.now().isoformat()
             note_annotation = {
-                'id': len(annotations[pdf_name].get('notes', [])) + 1,
-                'text': text.strip(),
-                'note': note.strip(),
+                'id': _next_id(annotations[pdf_name], 'notes'),
+                'text': stripped_text,
+                'note': stripped_note,
                 'topic': topic.strip(),
-                'timestamp': datetime.now().isoformat(),
-                'text_preview': text.strip()[:100] + "..." if len(text.strip()) > 100 else text.strip()
+                'timestamp': timestamp
             }
             
-            annotations[pdf_name]['notes'].append(note_annotation)
+            _insert_annotation(annotations[pdf_name], 'notes', note_annotation)
             
             # Add to topics
             if topic not in topics:
-                topics[topic] = {
-                    'name': topic,
-                    'created': datetime.now().isoformat(),
-                    'notes': [],
-                    'highlights': [],
-                    'comments': []
-                }
+                topics[topic] = _new_topic(topic, timestamp)
             
-            topics[topic]['notes'].append({
-                'note': note.strip(),
-                'text': text.strip(),
-                'timestamp': datetime.now().isoformat(),
+            topic_note = {
+                'note': stripped_note,
+                'text': stripped_text,
+                'timestamp': timestamp,
                 'note_id': note_annotation['id']
-            })
-            
-            # Save both
-            success1 = self.save_annotations(pdf_name, annotations)
-            success2 = self.save_topics(pdf_name, topics)
-            
-            return success1 and success2
+            }
+            topics[topic]['notes'].append(topic_note)
+            
+            # Log both
+            annotations_log_size = self._append_event(
+                self.get_annotation_file_path(pdf_name), 'notes', note_annotation
+            )
+            topics_log_size = self._append_event(
+                self.get_topics_file_path(pdf_name), 'topic_note',
+                {'topic': topic, 'created': topics[topic]['created'], 'note': topic_note}
+            )
+            
+            if max(annotations_log_size, topics_log_size) > LOG_COMPACT_BYTES:
+                return self.save_annotations_and_topics(pdf_name, annotations, topics)
+            return True
             
-        except Exception as e:
-            print(f"Error adding note: {e}")
+        except Exception:
+            logger.exception("Error adding note")
             return False
     
     def apply_highlights_to_text(self, text: str, annotations: Dict[str, Any]) -> str:
@@ -177,37 +703,35 @@ class AnnotationManager:
             if not annotations or 'highlights' not in annotations:
                 return text
             
-            # Create a copy of text to modify
-            highlighted_text = text
-            
-            # Color mapping
-            color_map = {
-                'Light Green': '#90EE90',
-                'Light Yellow': '#FFFFE0',
-                'Light Blue': '#ADD8E6',
-                'Light Pink': '#FFB6C1',
-                'Light Red': '#FFA07A'
-            }
+            # Highlight text -> background; a repeated text keeps its last color
+            color_by_text = {}
+            for highlight in annotations['highlights']:
+                highlight_text = highlight['text'].strip()
+                if highlight_text:
+                    color_by_text[highlight_text] = HIGHLIGHT_COLOR_MAP.get(highlight['color'], '#FFFFE0')
+            if not color_by_text:
+                return text
             
-            # Sort highlights by text length (longest first) to avoid nested highlighting issues
-            highlights = sorted(annotations['highlights'], key=lambda x: len(x['text']), reverse=True)
+            if ahocorasick is not None:
+                occurrences = _occurrences_single_scan(text, color_by_text)
+                find = lambda highlight_text: occurrences.get(highlight_text, ())
+            else:
+                find = lambda highlight_text: _find_all(text, highlight_text)
             
-            for highlight in highlights:
+            # Distinct highlight texts, longest first (ties in list order)
+            candidates = {}
+            for highlight in self._sorted_highlights(annotations['highlights']):
                 highlight_text = highlight['text'].strip()
-                color = highlight['color']
-                bg_color = color_map.get(color, '#FFFFE0')
-                
-                # Create highlighted version
-                highlighted_version = f'<mark style="background-color: {bg_color}; padding: 2px 4px; border-radius: 3px; margin: 1px;">{highlight_text}</mark>'
-                
-                # Replace in text (only first occurrence to avoid duplicates)
-                if highlight_text in highlighted_text:
-                    highlighted_text = highlighted_text.replace(highlight_text, highlighted_version, 1)
-            
-            return highlighted_text
-            
-        except Exception as e:
-            print(f"Error applying highlights: {e}")
+                if highlight_text and highlight_text not in candidates:
+                    candidates[highlight_text] = (color_by_text[highlight_text], find(highlight_text))
+            
+            return _render_marks(text, _claim_spans(
+                (highlight_text, bg_color, positions)
+                for highlight_text, (bg_color, positions) in candidates.items()
+            ))
+            
+        except Exception:
+            logger.exception("Error applying highlights")
             return text
     
     def get_annotation_summary(self, pdf_name: str) -> Dict[str, Any]:
@@ -227,27 +751,26 @@ class AnnotationManager:
             
             pdf_annotations = annotations[pdf_name]
             
-            # Get latest timestamp
-            all_timestamps = []
-            for item_list in [pdf_annotations.get('highlights', []), 
-                             pdf_annotations.get('comments', []), 
-                             pdf_annotations.get('notes', [])]:
-                for item in item_list:
-                    if 'timestamp' in item:
-                        all_timestamps.append(item['timestamp'])
-            
-            last_modified = max(all_timestamps) if all_timestamps else None
+            # Counts and last_modified are maintained on insert; older
+            # records without them fall back to a scan
+            counts = pdf_annotations.get('counts')
+            if counts is None:
+                counts = {kind: len(pdf_annotations.get(kind, [])) for kind in ANNOTATION_KINDS}
+            if 'last_modified' in pdf_annotations:
+                last_modified = pdf_annotations['last_modified']
+            else:
+                last_modified = _latest_timestamp(pdf_annotations)
             
             return {
-                'total_highlights': len(pdf_annotations.get('highlights', [])),
-                'total_comments': len(pdf_annotations.get('comments', [])),
-                'total_notes': len(pdf_annotations.get('notes', [])),
+                'total_highlights': counts.get('highlights', 0),
+                'total_comments': counts.get('comments', 0),
+                'total_notes': counts.get('notes', 0),
                 'total_topics': len(topics),
                 'last_modified': last_modified
             }
             
-        except Exception as e:
-            print(f"Error getting annotation summary: {e}")
+        except Exception:
+            logger.exception("Error getting annotation summary")
             return {
                 'total_highlights': 0,
                 'total_comments': 0,
@@ -264,21 +787,32 @@ class AnnotationManager:
                 return False
             
             # Find and remove the annotation
+            # Seed counters before deleting so an older record never reissues the deleted id
+            _ensure_counters(annotations[pdf_name])
             annotations_list = annotations[pdf_name][annotation_type]
-            annotations[pdf_name][annotation_type] = [
-                ann for ann in annotations_list if ann.get('id') != annotation_id
-            ]
+            if not _remove_by_id(annotations[pdf_name], annotation_type, annotation_id):
+                return True
+            _refresh_after_remove(annotations[pdf_name], annotation_type)
+            sorted_highlights = self._cached_sorted_highlights(annotations_list)
+            if annotation_type == 'highlights' and sorted_highlights is not None:
+                sorted_highlights[:] = [ann for ann in sorted_highlights if ann.get('id') != annotation_id]
             
-            return self.save_annotations(pdf_name, annotations)
+            annotations_file = self.get_annotation_file_path(pdf_name)
+            tombstone = {'type': annotation_type, 'id': annotation_id}
+            if self._append_event(annotations_file, 'del', tombstone) > LOG_COMPACT_BYTES:
+                return self.save_annotations(pdf_name, annotations)
+            return True
             
-        except Exception as e:
-            print(f"Error deleting annotation: {e}")
+        except Exception:
+            logger.exception("Error deleting annotation")
             return False
     
     def search_annotations(self, pdf_name: str, query: str) -> Dict[str, List[Any]]:
         """Search through annotations"""
         try:
-            annotations = self.load_annotations(pdf_name)
+            annotations_file = self.get_annotation_file_path(pdf_name)
+            version = _file_version(annotations_file)
+            annotations = _load_json(annotations_file, pdf_name, version)
             topics = self.load_topics(pdf_name)
             
             if pdf_name not in annotations:
@@ -293,24 +827,11 @@ class AnnotationManager:
             }
             
             pdf_annotations = annotations[pdf_name]
+            search_index = _search_index(annotations_file, pdf_name, version)
             
-            # Search highlights
-            for highlight in pdf_annotations.get('highlights', []):
-                if query_lower in highlight.get('text', '').lower():
-                    results['highlights'].append(highlight)
-            
-            # Search comments
-            for comment in pdf_annotations.get('comments', []):
-                if (query_lower in comment.get('text', '').lower() or 
-                    query_lower in comment.get('comment', '').lower()):
-                    results['comments'].append(comment)
-            
-            # Search notes
-            for note in pdf_annotations.get('notes', []):
-                if (query_lower in note.get('text', '').lower() or 
-                    query_lower in note.get('note', '').lower() or
-                    query_lower in note.get('topic', '').lower()):
-                    results['notes'].append(note)
+            # Search highlights, comments and notes
+            for kind in ANNOTATION_KINDS:
+                results[kind] = _matching_items(pdf_annotations.get(kind, []), search_index[kind], query_lower)
             
             # Search topics
             for topic_name, topic_data in topics.items():
@@ -325,6 +846,6 @@ class AnnotationManager:
             
             return results
             
-        except Exception as e:
-            print(f"Error searching annotations: {e}")
+        except Exception:
+            logger.exception("Error searching annotations")
             return {'highlights': [], 'comments': [], 'notes': [], 'topics': []}
@@ -1,17 +1,35 @@
 import streamlit as st
 import os
 import json
+import hashlib
 from pdf_processor import PDFProcessor
 from annotation_manager import AnnotationManager
 from note_generator import NoteGenerator
 from utils import create_directories, get_color_options
 
+@st.cache_data(show_spinner=False)
+def _cached_extract_text(pdf_name: str, file_hash: str, _pdf_bytes) -> tuple:
+    """Extract PDF text and its page spans once per uploaded file content"""
+    processor = PDFProcessor()
+    text = processor.extract_text_from_bytes(_pdf_bytes)
+    return text, processor.page_offsets
+
+@st.cache_data(show_spinner=False)
+def _cached_text_chunks(pdf_name: str, text_hash: str, _text: str, chunk_size: int,
+                        _page_offsets: list) -> list:
+    """Split PDF text into display chunks once per document"""
+    return PDFProcessor().split_text_into_chunks(_text, chunk_size, _page_offsets)
+
 def initialize_session_state():
     """Initialize session state variables"""
     if 'current_pdf' not in st.session_state:
         st.session_state.current_pdf = None
     if 'pdf_text' not in st.session_state:
         st.session_state.pdf_text = ""
+    if 'pdf_hash' not in st.session_state:
+        st.session_state.pdf_hash = None
+    if 'page_offsets' not in st.session_state:
+        st.session_state.page_offsets = []
     if 'annotations' not in st.session_state:
         st.session_state.annotations = {}
     if 'topics' not in st.session_state:
@@ -38,6 +56,9 @@ def main():
     # Create necessary directories
     create_directories()
     
+    # Highlight color options, shared by the picker and the annotation list
+    highlight_colors = get_color_options()
+    
     # Initialize processors
     pdf_processor = PDFProcessor()
     annotation_manager = AnnotationManager()
@@ -59,13 +80,17 @@ def main():
                 # Process new PDF
                 st.session_state.current_pdf = uploaded_file.name
                 
-                # Save uploaded file
-                with open(f"temp_{uploaded_file.name}", "wb") as f:
-                    f.write(uploaded_file.getbuffer())
+                # Content hash keys the extraction and chunking caches
+                pdf_bytes = uploaded_file.getbuffer()
+                st.session_state.pdf_hash = hashlib.blake2b(pdf_bytes, digest_size=8).hexdigest()
                 
-                # Extract text and process PDF
+                # Extract text straight from the upload buffer
                 with st.spinner("Processing PDF..."):
-                    st.session_state.pdf_text = pdf_processor.extract_text(f"temp_{uploaded_file.name}")
+                    st.session_state.pdf_text, st.session_state.page_offsets = _cached_extract_text(
+                        uploaded_file.name,
+                        st.session_state.pdf_hash,
+                        pdf_bytes
+                    )
                     st.session_state.annotations = annotation_manager.load_annotations(uploaded_file.name)
                     st.session_state.topics = annotation_manager.load_topics(uploaded_file.name)
                 
@@ -90,7 +115,11 @@ def main():
         st.session_state.search_query = search_query
         
         if search_query and st.session_state.pdf_text:
-            search_results = pdf_processor.search_text(st.session_state.pdf_text, search_query)
+            try:
+                search_results = pdf_processor.search_text(st.session_state.pdf_text, search_query)
+            except Exception as e:
+                st.error(f"Search failed: {e}")
+                search_results = []
             if search_results:
                 st.write(f"Found {len(search_results)} results")
                 for i, result in enumerate(search_results[:5]):  # Show first 5 results
@@ -145,7 +174,13 @@ def main():
         text_area_height = 400 if st.session_state.view_mode == "Portrait" else 300
         
         # Split text into manageable chunks for display
-        text_chunks = pdf_processor.split_text_into_chunks(st.session_state.pdf_text, 2000)
+        text_chunks = _cached_text_chunks(
+            st.session_state.current_pdf,
+            st.session_state.pdf_hash,
+            st.session_state.pdf_text,
+            2000,
+            st.session_state.page_offsets
+        )
         
         # Page navigation
         if len(text_chunks) > 1:
@@ -182,7 +217,6 @@ def main():
             with col1:
                 # Highlighting
                 st.write("**Highlight Options:**")
-                highlight_colors = get_color_options()
                 selected_color = st.selectbox(
                     "Choose highlight color:",
                     options=list(highlight_colors.keys()),
@@ -281,7 +315,7 @@ def main():
                 if annotations.get('highlights'):
                     with st.expander(f"🖍️ Highlights ({len(annotations['highlights'])})"):
                         for i, highlight in enumerate(annotations['highlights']):
-                            color_info = get_color_options()[highlight['color']]
+                            color_info = highlight_colors[highlight['color']]
                             st.markdown(
                                 f"<div style='background-color: {color_info['hex']}; padding: 8px; margin: 4px 0; border-radius: 4px;'>"
                                 f"<strong>{highlight['color']} {color_info['emoji']}</strong><br>"
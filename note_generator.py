@@ -1,65 +1,77 @@
+import functools
+import io
 import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import chain
+from reportlab import rl_config
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Flowable, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+from utils import format_timestamp, get_worker_context
 
-class NoteGenerator:
-    """Generates PDF notes from annotations"""
-    
-    def __init__(self):
-        self.notes_dir = "notes_output"
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
-    
-    def _setup_custom_styles(self):
-        """Setup custom paragraph styles"""
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # optional, see the "fast" extra; needed only to split combined topic PDFs
+    PdfReader = PdfWriter = None
+
+# Skip ReportLab's per-attribute shape validation; it dominates paragraph-heavy builds
+rl_config.shapeChecking = 0
+
+
+def _build_styles() -> Dict[str, Any]:
+    """Build the sample stylesheet and custom paragraph styles"""
+    styles = getSampleStyleSheet()
+    return {
+        'sample': styles,
+        
         # Title style
-        self.title_style = ParagraphStyle(
+        'title': ParagraphStyle(
             'CustomTitle',
-            parent=self.styles['Heading1'],
+            parent=styles['Heading1'],
             fontSize=18,
             spaceAfter=30,
             alignment=1,  # Center alignment
             textColor=colors.darkblue
-        )
+        ),
         
         # Heading style
-        self.heading_style = ParagraphStyle(
+        'heading': ParagraphStyle(
             'CustomHeading',
-            parent=self.styles['Heading2'],
+            parent=styles['Heading2'],
             fontSize=14,
             spaceAfter=12,
             spaceBefore=20,
             textColor=colors.darkgreen
-        )
+        ),
         
         # Subheading style
-        self.subheading_style = ParagraphStyle(
+        'subheading': ParagraphStyle(
             'CustomSubheading',
-            parent=self.styles['Heading3'],
+            parent=styles['Heading3'],
             fontSize=12,
             spaceAfter=8,
             spaceBefore=15,
             textColor=colors.blue
-        )
+        ),
         
         # Body text style
-        self.body_style = ParagraphStyle(
+        'body': ParagraphStyle(
             'CustomBody',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=10,
             spaceAfter=6,
             leftIndent=20
-        )
+        ),
         
         # Quote style for highlighted text
-        self.quote_style = ParagraphStyle(
+        'quote': ParagraphStyle(
             'Quote',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=9,
             leftIndent=30,
             rightIndent=30,
@@ -69,6 +81,134 @@ class NoteGenerator:
             borderPadding=8,
             backColor=colors.lightgrey
         )
+    }
+
+
+# Styles are immutable once built, so every NoteGenerator shares one set
+_STYLES = _build_styles()
+
+
+# Finished PDFs are written through a 1 MiB buffer rather than the 8 KiB default
+_WRITE_BUFFER_SIZE = 1 << 20
+
+
+def _layout_pdf(story: List[Flowable]) -> io.BytesIO:
+    """Lay out the story into an in-memory PDF"""
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=A4).build(story)
+    return buffer
+
+
+def _build_pdf(story: List[Flowable], output_path: str):
+    """Lay out the story in memory, then write the PDF in one buffered write"""
+    buffer = _layout_pdf(story)
+    with open(output_path, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+        f.write(buffer.getbuffer())
+
+
+class _PageMarker(Flowable):
+    """Zero-size flowable that records the page it lands on"""
+    
+    def __init__(self, pages: Dict[str, int], key: str):
+        super().__init__()
+        self.pages = pages
+        self.key = key
+    
+    def wrap(self, available_width, available_height):
+        return 0, 0
+    
+    def draw(self):
+        self.pages[self.key] = self.canv.getPageNumber()
+
+
+@functools.lru_cache(maxsize=32)
+def _topic_source_prelude(pdf_name: str, generated_on: str) -> Tuple[Flowable, ...]:
+    """Source and generation-time flowables shared by the topic PDFs of one document
+    
+    Keyed by the minute-resolution timestamp, so a batch of topic exports
+    built within the same minute reuses the same flowables.
+    """
+    return (
+        Paragraph(f"From: {pdf_name}", _STYLES['sample']['Normal']),
+        Paragraph(f"Generated on: {generated_on}", _STYLES['sample']['Normal']),
+        Spacer(1, 20),
+    )
+
+
+# Display format for annotation timestamps
+_FMT = '%m/%d/%Y %I:%M %p'
+
+
+def _render_topic_note(i: int, note: Dict[str, Any], space_after: int) -> List[Flowable]:
+    """Flowables for one note listed under its topic"""
+    parts = [Paragraph(f"{i}. {note.get('note', '')}", _STYLES['body'])]
+    
+    # Original text reference
+    if note.get('text'):
+        ref_text = f"<i>Reference: \"{note['text'][:100]}...\"</i>"
+        parts.append(Paragraph(ref_text, _STYLES['quote']))
+    
+    parts.append(Spacer(1, space_after))
+    return parts
+
+
+def _render_highlight(i: int, highlight: Dict[str, Any]) -> List[Flowable]:
+    """Flowables for one highlight: the text and when it was highlighted"""
+    formatted_time = format_timestamp(highlight.get('timestamp', ''), _FMT)
+    return [
+        Paragraph(f"{i}. {highlight.get('text', '')}", _STYLES['quote']),
+        Paragraph(f"<i>Highlighted on: {formatted_time}</i>", _STYLES['body']),
+        Spacer(1, 10)
+    ]
+
+
+def _render_comment(i: int, comment: Dict[str, Any]) -> List[Flowable]:
+    """Flowables for one comment and the text it refers to"""
+    body_style = _STYLES['body']
+    original_text = comment.get('text', '')
+    formatted_time = format_timestamp(comment.get('timestamp', ''), _FMT)
+    
+    parts = [Paragraph(f"Comment #{i}", _STYLES['subheading'])]
+    if original_text:
+        parts.append(Paragraph("<b>Original Text:</b>", body_style))
+        parts.append(Paragraph(f'"{original_text}"', _STYLES['quote']))
+    parts.append(Paragraph("<b>Comment:</b>", body_style))
+    parts.append(Paragraph(comment.get('comment', ''), body_style))
+    parts.append(Paragraph(f"<i>Added on: {formatted_time}</i>", body_style))
+    parts.append(Spacer(1, 15))
+    return parts
+
+
+def _render_note(i: int, note: Dict[str, Any]) -> List[Flowable]:
+    """Flowables for one note in the individual notes section"""
+    body_style = _STYLES['body']
+    original_text = note.get('text', '')
+    topic = note.get('topic', 'General')
+    formatted_time = format_timestamp(note.get('timestamp', ''), _FMT)
+    
+    parts = [
+        Paragraph(f"Note #{i} (Topic: {topic})", _STYLES['subheading']),
+        Paragraph(note.get('note', ''), body_style)
+    ]
+    if original_text:
+        parts.append(Paragraph("<b>Reference Text:</b>", body_style))
+        parts.append(Paragraph(f'"{original_text[:200]}..."', _STYLES['quote']))
+    parts.append(Paragraph(f"<i>Added on: {formatted_time}</i>", body_style))
+    parts.append(Spacer(1, 15))
+    return parts
+
+
+class NoteGenerator:
+    """Generates PDF notes from annotations"""
+    
+    def __init__(self):
+        self.notes_dir = "notes_output"
+        self.styles = _STYLES['sample']
+        self.title_style = _STYLES['title']
+        self.heading_style = _STYLES['heading']
+        self.subheading_style = _STYLES['subheading']
+        self.body_style = _STYLES['body']
+        self.quote_style = _STYLES['quote']
     
     def create_notes_pdf(self, pdf_name: str, annotations: Dict[str, Any], 
                         topics: Dict[str, Any]) -> str:
@@ -82,8 +222,7 @@ class NoteGenerator:
             output_filename = f"Notes-{clean_name}.pdf"
             output_path = os.path.join(self.notes_dir, output_filename)
             
-            # Create PDF document
-            doc = SimpleDocTemplate(output_path, pagesize=A4)
+            # Collect PDF content
             story = []
             
             # Add title
@@ -116,7 +255,7 @@ class NoteGenerator:
                 self._add_individual_notes_section(story, annotations[pdf_name]['notes'])
             
             # Build PDF
-            doc.build(story)
+            _build_pdf(story, output_path)
             
             return output_path
             
@@ -124,6 +263,21 @@ class NoteGenerator:
             print(f"Error creating notes PDF: {e}")
             return None
     
+    def create_notes_pdfs(self, batch: List[Tuple[str, Dict[str, Any], Dict[str, Any]]],
+                          max_workers: Optional[int] = None) -> List[Optional[str]]:
+        """Create notes PDFs for several documents in parallel worker processes
+        
+        batch holds (pdf_name, annotations, topics) tuples; the output paths
+        come back in the same order.
+        """
+        if len(batch) <= 1:
+            return [self.create_notes_pdf(*job) for job in batch]
+        
+        workers = min(len(batch), max_workers or os.cpu_count() or 1)
+        worker = functools.partial(_create_notes_pdf_worker, self.notes_dir)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_worker_context()) as executor:
+            return list(executor.map(worker, batch))
+    
     def _add_summary(self, story, pdf_name: str, annotations: Dict[str, Any], 
                     topics: Dict[str, Any]):
         """Add summary section to the PDF"""
@@ -162,143 +316,139 @@ class NoteGenerator:
     
     def _add_notes_by_topic(self, story, topics: Dict[str, Any]):
         """Add notes organized by topic"""
-        story.append(Paragraph("📚 Notes by Topic", self.heading_style))
+        parts = [Paragraph("📚 Notes by Topic", self.heading_style)]
         
         for topic_name, topic_data in topics.items():
             # Topic heading
-            story.append(Paragraph(f"🔖 {topic_name}", self.subheading_style))
+            parts.append(Paragraph(f"🔖 {topic_name}", self.subheading_style))
             
             # Topic notes
             notes = topic_data.get('notes', [])
             if notes:
-                for i, note in enumerate(notes, 1):
-                    # Note content
-                    note_text = f"{i}. {note.get('note', '')}"
-                    story.append(Paragraph(note_text, self.body_style))
-                    
-                    # Original text reference
-                    if note.get('text'):
-                        ref_text = f"<i>Reference: \"{note['text'][:100]}...\"</i>"
-                        story.append(Paragraph(ref_text, self.quote_style))
-                    
-                    story.append(Spacer(1, 8))
+                parts.extend(chain.from_iterable(
+                    _render_topic_note(i, note, 8) for i, note in enumerate(notes, 1)
+                ))
             else:
-                story.append(Paragraph("No notes in this topic yet.", self.body_style))
+                parts.append(Paragraph("No notes in this topic yet.", self.body_style))
             
-            story.append(Spacer(1, 15))
+            parts.append(Spacer(1, 15))
+        
+        story.extend(parts)
     
     def _add_highlights_section(self, story, highlights: list):
         """Add highlights section"""
-        story.append(Paragraph("🖍️ Highlights", self.heading_style))
-        
         # Group highlights by color
-        color_groups = {}
+        color_groups = defaultdict(list)
         for highlight in highlights:
-            color = highlight.get('color', 'Unknown')
-            if color not in color_groups:
-                color_groups[color] = []
-            color_groups[color].append(highlight)
+            color_groups[highlight.get('color', 'Unknown')].append(highlight)
         
+        parts = [Paragraph("🖍️ Highlights", self.heading_style)]
         for color, color_highlights in color_groups.items():
             # Color subheading
-            story.append(Paragraph(f"🎨 {color} Highlights", self.subheading_style))
-            
-            for i, highlight in enumerate(color_highlights, 1):
-                highlight_text = highlight.get('text', '')
-                timestamp = highlight.get('timestamp', '')
-                
-                # Format timestamp
-                try:
-                    if timestamp:
-                        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                        formatted_time = dt.strftime('%m/%d/%Y %I:%M %p')
-                    else:
-                        formatted_time = 'Unknown time'
-                except:
-                    formatted_time = 'Unknown time'
-                
-                # Add highlight content
-                content = f"{i}. {highlight_text}"
-                story.append(Paragraph(content, self.quote_style))
-                
-                # Add timestamp
-                time_text = f"<i>Highlighted on: {formatted_time}</i>"
-                story.append(Paragraph(time_text, self.body_style))
-                story.append(Spacer(1, 10))
+            parts.append(Paragraph(f"🎨 {color} Highlights", self.subheading_style))
+            parts.extend(chain.from_iterable(
+                _render_highlight(i, highlight) for i, highlight in enumerate(color_highlights, 1)
+            ))
+        parts.append(Spacer(1, 15))
         
-        story.append(Spacer(1, 15))
+        story.extend(parts)
     
     def _add_comments_section(self, story, comments: list):
         """Add comments section"""
         story.append(Paragraph("💬 Comments", self.heading_style))
-        
-        for i, comment in enumerate(comments, 1):
-            original_text = comment.get('text', '')
-            comment_text = comment.get('comment', '')
-            timestamp = comment.get('timestamp', '')
-            
-            # Format timestamp
-            try:
-                if timestamp:
-                    dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                    formatted_time = dt.strftime('%m/%d/%Y %I:%M %p')
-                else:
-                    formatted_time = 'Unknown time'
-            except:
-                formatted_time = 'Unknown time'
-            
-            # Comment heading
-            story.append(Paragraph(f"Comment #{i}", self.subheading_style))
-            
-            # Original text
-            if original_text:
-                story.append(Paragraph("<b>Original Text:</b>", self.body_style))
-                story.append(Paragraph(f'"{original_text}"', self.quote_style))
-            
-            # Comment
-            story.append(Paragraph("<b>Comment:</b>", self.body_style))
-            story.append(Paragraph(comment_text, self.body_style))
-            
-            # Timestamp
-            time_text = f"<i>Added on: {formatted_time}</i>"
-            story.append(Paragraph(time_text, self.body_style))
-            story.append(Spacer(1, 15))
+        story.extend(chain.from_iterable(
+            _render_comment(i, comment) for i, comment in enumerate(comments, 1)
+        ))
     
     def _add_individual_notes_section(self, story, notes: list):
         """Add individual notes section"""
         story.append(Paragraph("📝 Individual Notes", self.heading_style))
+        story.extend(chain.from_iterable(
+            _render_note(i, note) for i, note in enumerate(notes, 1)
+        ))
+    
+    def _topic_output_path(self, pdf_name: str, topic_name: str) -> str:
+        """Output path for a single topic's PDF"""
+        clean_pdf_name = pdf_name.replace('.pdf', '')
+        clean_topic_name = topic_name.replace(' ', '_')
+        return os.path.join(self.notes_dir, f"Topic-{clean_topic_name}-{clean_pdf_name}.pdf")
+    
+    def _topic_story(self, pdf_name: str, topic_name: str, topic_data: Dict[str, Any],
+                     generated_on: str) -> List[Flowable]:
+        """Flowables for one topic: title, source info and its notes"""
+        # Add title
+        story = [Paragraph(f"Topic: {topic_name}", self.title_style), Spacer(1, 20)]
         
-        for i, note in enumerate(notes, 1):
-            original_text = note.get('text', '')
-            note_text = note.get('note', '')
-            topic = note.get('topic', 'General')
-            timestamp = note.get('timestamp', '')
-            
-            # Format timestamp
-            try:
-                if timestamp:
-                    dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                    formatted_time = dt.strftime('%m/%d/%Y %I:%M %p')
-                else:
-                    formatted_time = 'Unknown time'
-            except:
-                formatted_time = 'Unknown time'
-            
-            # Note heading
-            story.append(Paragraph(f"Note #{i} (Topic: {topic})", self.subheading_style))
-            
-            # Note content
-            story.append(Paragraph(note_text, self.body_style))
+        # Add source info
+        story.extend(_topic_source_prelude(pdf_name, generated_on))
+        
+        # Add topic notes
+        notes = topic_data.get('notes', [])
+        if notes:
+            story.append(Paragraph("📝 Notes", self.heading_style))
+            story.extend(chain.from_iterable(
+                _render_topic_note(i, note, 10) for i, note in enumerate(notes, 1)
+            ))
+        
+        return story
+    
+    def create_all_topic_pdfs(self, pdf_name: str, topics: Dict[str, Any],
+                              split: bool = True) -> Dict[str, str]:
+        """Create the PDFs for every topic of a document with a single layout pass
+        
+        All topics are laid out as sections of one document. With split=True
+        (and pypdf installed) it is cut into the usual per-topic files;
+        otherwise one combined Topics-<pdf>.pdf is written. Returns the
+        output path for each topic name.
+        """
+        if not topics:
+            return {}
+        
+        if split and PdfWriter is None:
+            return {topic_name: self.create_topic_summary_pdf(pdf_name, topic_name, topic_data)
+                    for topic_name, topic_data in topics.items()}
+        
+        try:
+            os.makedirs(self.notes_dir, exist_ok=True)
             
-            # Original text reference
-            if original_text:
-                story.append(Paragraph("<b>Reference Text:</b>", self.body_style))
-                story.append(Paragraph(f'"{original_text[:200]}..."', self.quote_style))
+            # One story with a page break and a page marker before each topic section
+            generated_on = datetime.now().strftime('%B %d, %Y at %I:%M %p')
+            start_pages = {}
+            story = []
+            for topic_name, topic_data in topics.items():
+                if story:
+                    story.append(PageBreak())
+                story.append(_PageMarker(start_pages, topic_name))
+                story.extend(self._topic_story(pdf_name, topic_name, topic_data, generated_on))
+            
+            buffer = _layout_pdf(story)
+            
+            if not split:
+                clean_pdf_name = pdf_name.replace('.pdf', '')
+                output_path = os.path.join(self.notes_dir, f"Topics-{clean_pdf_name}.pdf")
+                with open(output_path, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+                    f.write(buffer.getbuffer())
+                return dict.fromkeys(topics, output_path)
+            
+            # Cut the combined document at each topic's first page
+            reader = PdfReader(buffer)
+            starts = [start_pages[topic_name] - 1 for topic_name in topics]
+            ends = starts[1:] + [len(reader.pages)]
+            output_paths = {}
+            for topic_name, start, end in zip(topics, starts, ends):
+                writer = PdfWriter()
+                for page_index in range(start, end):
+                    writer.add_page(reader.pages[page_index])
+                output_path = self._topic_output_path(pdf_name, topic_name)
+                with open(output_path, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+                    writer.write(f)
+                output_paths[topic_name] = output_path
+            
+            return output_paths
             
-            # Timestamp
-            time_text = f"<i>Added on: {formatted_time}</i>"
-            story.append(Paragraph(time_text, self.body_style))
-            story.append(Spacer(1, 15))
+        except Exception as e:
+            print(f"Error creating topic PDFs: {e}")
+            return {}
     
     def create_topic_summary_pdf(self, pdf_name: str, topic_name: str, 
                                 topic_data: Dict[str, Any]) -> str:
@@ -308,46 +458,24 @@ class NoteGenerator:
             os.makedirs(self.notes_dir, exist_ok=True)
             
             # Generate output filename
-            clean_pdf_name = pdf_name.replace('.pdf', '')
-            clean_topic_name = topic_name.replace(' ', '_')
-            output_filename = f"Topic-{clean_topic_name}-{clean_pdf_name}.pdf"
-            output_path = os.path.join(self.notes_dir, output_filename)
+            output_path = self._topic_output_path(pdf_name, topic_name)
             
-            # Create PDF document
-            doc = SimpleDocTemplate(output_path, pagesize=A4)
-            story = []
-            
-            # Add title
-            title = f"Topic: {topic_name}"
-            story.append(Paragraph(title, self.title_style))
-            story.append(Spacer(1, 20))
-            
-            # Add source info
-            source_info = f"From: {pdf_name}"
-            story.append(Paragraph(source_info, self.styles['Normal']))
-            gen_info = f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}"
-            story.append(Paragraph(gen_info, self.styles['Normal']))
-            story.append(Spacer(1, 20))
-            
-            # Add topic notes
-            notes = topic_data.get('notes', [])
-            if notes:
-                story.append(Paragraph("📝 Notes", self.heading_style))
-                for i, note in enumerate(notes, 1):
-                    note_text = f"{i}. {note.get('note', '')}"
-                    story.append(Paragraph(note_text, self.body_style))
-                    
-                    if note.get('text'):
-                        ref_text = f"<i>Reference: \"{note['text'][:100]}...\"</i>"
-                        story.append(Paragraph(ref_text, self.quote_style))
-                    
-                    story.append(Spacer(1, 10))
+            # Collect PDF content
+            generated_on = datetime.now().strftime('%B %d, %Y at %I:%M %p')
+            story = self._topic_story(pdf_name, topic_name, topic_data, generated_on)
             
             # Build PDF
-            doc.build(story)
+            _build_pdf(story, output_path)
             
             return output_path
             
         except Exception as e:
             print(f"Error creating topic PDF: {e}")
             return None
+
+
+def _create_notes_pdf_worker(notes_dir: str, job: Tuple[str, Dict[str, Any], Dict[str, Any]]) -> Optional[str]:
+    """Process-pool entry point that builds one notes PDF"""
+    generator = NoteGenerator()
+    generator.notes_dir = notes_dir
+    return generator.create_notes_pdf(*job)
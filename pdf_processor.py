@@ -1,6 +1,277 @@
 import pdfplumber
+import bisect
+import functools
+import hashlib
+import io
+import math
+import os
 import re
-from typing import List, Dict, Any
+import tempfile
+import time
+import orjson
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat
+from types import MappingProxyType
+from typing import List, Dict, Any, Mapping, Optional, Set, Tuple
+from utils import count_words, get_line_starts, get_lines_text, get_worker_context
+
+try:
+    import ahocorasick
+except ImportError:  # optional accelerator, see the "fast" extra
+    ahocorasick = None
+
+try:
+    import pymupdf  # C-backed text extraction, much faster than pdfminer
+except ImportError:
+    pymupdf = None
+
+TEXT_CACHE_DIR = os.path.join("temp", "pdfcache")
+# Part of every cache key; bump it whenever the entry layout changes
+TEXT_CACHE_VERSION = 2
+# Least recently used entries are evicted past the size cap; any entry unused
+# for longer than the age cap is dropped
+TEXT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+TEXT_CACHE_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+# Documents this short are always extracted serially. Longer ones time a
+# sample of pages first and fan the rest out only when the estimated serial
+# time outweighs the pool's startup (forkserver plus a PyMuPDF import, about
+# a quarter of a second per worker as measured)
+PARALLEL_EXTRACT_MIN_PAGES = 256
+PARALLEL_EXTRACT_SAMPLE_PAGES = 16
+PARALLEL_EXTRACT_WORKER_STARTUP_SECONDS = 0.25
+PARALLEL_EXTRACT_MAX_WORKERS = 8
+
+# Statistics of empty text, shared read-only instead of rebuilt on every call
+_EMPTY_TEXT_STATS = MappingProxyType({
+    'word_count': 0,
+    'character_count': 0,
+    'line_count': 1,
+    'page_count': 0,
+    'estimated_reading_time': "0.0 minutes"
+})
+
+_HEADING_NUM_RE = re.compile(r'^\d+\.?\s+[A-Z]')
+_LEAD_NUM_RE = re.compile(r'^\d+\.?\s*')
+_WHITESPACE_RE = re.compile(r'\s')
+_NON_SPACE_RE = re.compile(r'\S')
+
+
+@functools.lru_cache(maxsize=256)
+def _search_pattern(term: str, case_sensitive: bool) -> re.Pattern:
+    """Compile (and memoize) the literal pattern for a search term"""
+    return re.compile(re.escape(term), 0 if case_sensitive else re.IGNORECASE)
+
+
+def _page_offsets(pages: Dict[int, Dict[str, Any]]) -> List[Tuple[int, int, int]]:
+    """Return (start, end, page_num) spans of each page's marker and text in the joined full text"""
+    offsets = []
+    start = 0
+    for entry in pages.values():
+        end = start + len(f"\n--- Page {entry['page_num']} ---\n") + len(entry['text']) + 1
+        offsets.append((start, end, entry['page_num']))
+        start = end
+    return offsets
+
+
+def _text_cache_path(pdf_path: str) -> str:
+    """Return the extraction cache file for a PDF, keyed by its path, mtime and size"""
+    stat = os.stat(pdf_path)
+    key = f"{TEXT_CACHE_VERSION}::{os.path.abspath(pdf_path)}::{stat.st_mtime_ns}::{stat.st_size}"
+    return os.path.join(TEXT_CACHE_DIR, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+
+def _join_pages(pages: Dict[int, Dict[str, Any]]) -> str:
+    """Join per-page entries into the full text with its '--- Page N ---' markers"""
+    parts = []
+    for entry in pages.values():
+        parts.append(f"\n--- Page {entry['page_num']} ---\n")
+        parts.append(entry['text'])
+        parts.append("\n")
+    return ''.join(parts)
+
+
+def _read_text_cache(cache_path: str) -> Optional[Dict[int, Dict[str, Any]]]:
+    """Load cached per-page entries, or None on a miss or unreadable file"""
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = orjson.loads(f.read())
+        # Plain data only: [page_index, text] pairs under the format version
+        if cached.get('v') != TEXT_CACHE_VERSION:
+            return None
+        pages = {}
+        for page_num, page_text in cached['pages']:
+            if not isinstance(page_num, int) or not isinstance(page_text, str):
+                return None
+            pages[page_num] = {'text': page_text, 'page_num': page_num + 1}
+        os.utime(cache_path)  # mark as recently used for eviction
+        return pages
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+
+def _write_text_cache(cache_path: str, pages: Dict[int, Dict[str, Any]]) -> None:
+    """Store per-page entries; the cache is best effort, so failures are ignored"""
+    tmp_path = None
+    try:
+        payload = orjson.dumps({
+            'v': TEXT_CACHE_VERSION,
+            'pages': [[page_num, entry['text']] for page_num, entry in pages.items()],
+        })
+        os.makedirs(TEXT_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=TEXT_CACHE_DIR)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, cache_path)
+    except (OSError, TypeError):
+        # TypeError covers orjson refusing text it cannot encode (lone surrogates)
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    _prune_text_cache()
+
+
+def _prune_text_cache() -> None:
+    """Evict entries past the age cap, then the least recently used ones past the size cap"""
+    try:
+        entries = []
+        with os.scandir(TEXT_CACHE_DIR) as it:
+            for entry in it:
+                if entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                elif entry.name.endswith('.pkl'):
+                    # Pickled entries from before TEXT_CACHE_VERSION; never read
+                    entries.append((0, 0, entry.path))
+    except OSError:
+        return
+    
+    # Newest first: keep entries until the size cap is reached
+    entries.sort(reverse=True)
+    oldest_allowed = time.time() - TEXT_CACHE_MAX_AGE_SECONDS
+    kept_bytes = 0
+    for mtime, size, path in entries:
+        if mtime >= oldest_allowed and kept_bytes + size <= TEXT_CACHE_MAX_BYTES:
+            kept_bytes += size
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _is_pdf_bytes(source) -> bool:
+    """Return True when source is an in-memory PDF rather than a path or file object"""
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+def _open_pymupdf(source):
+    """Open a PDF path or in-memory PDF with PyMuPDF"""
+    if _is_pdf_bytes(source):
+        return pymupdf.open(stream=source, filetype="pdf")
+    return pymupdf.open(source)
+
+
+def _page_range_texts_pymupdf(source, start: int, stop: int) -> List[str]:
+    """Extract text for pages [start, stop) with PyMuPDF (process-pool entry point)"""
+    with _open_pymupdf(source) as doc:
+        return [doc[page_num].get_text("text").rstrip('\n') for page_num in range(start, stop)]
+
+
+def _page_texts_pymupdf(source) -> List[str]:
+    """Extract per-page text with PyMuPDF, fanning large documents out across processes"""
+    if isinstance(source, memoryview):
+        source = bytes(source)
+    
+    with _open_pymupdf(source) as doc:
+        page_count = doc.page_count
+        workers = min(PARALLEL_EXTRACT_MAX_WORKERS, os.cpu_count() or 1)
+        # MuPDF is not thread-safe, so parallelism has to come from processes
+        if page_count < PARALLEL_EXTRACT_MIN_PAGES or workers < 2 or not isinstance(source, (str, bytes)):
+            return [page.get_text("text").rstrip('\n') for page in doc]
+        
+        started = time.perf_counter()
+        texts = [doc[page_num].get_text("text").rstrip('\n') for page_num in range(PARALLEL_EXTRACT_SAMPLE_PAGES)]
+        serial_estimate = (time.perf_counter() - started) / len(texts) * (page_count - len(texts))
+        workers = _parallel_workers(serial_estimate, workers)
+        if workers < 2:
+            texts.extend(doc[page_num].get_text("text").rstrip('\n') for page_num in range(len(texts), page_count))
+            return texts
+    
+    if isinstance(source, str):
+        return texts + _page_texts_parallel(source, len(texts), page_count, workers)
+    
+    # Workers open the document by path: spill the bytes to disk once
+    # instead of pickling a copy of the whole PDF to every worker
+    fd, spill_path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(source)
+        return texts + _page_texts_parallel(spill_path, len(texts), page_count, workers)
+    finally:
+        os.remove(spill_path)
+
+
+def _parallel_workers(serial_seconds: float, max_workers: int) -> int:
+    """Pick the worker count for an estimated serial extraction time; below 2 means stay serial.
+
+    With w workers the wall time is about serial_seconds / w plus w startups,
+    which is smallest at w = sqrt(serial_seconds / startup).
+    """
+    startup = PARALLEL_EXTRACT_WORKER_STARTUP_SECONDS
+    workers = min(max_workers, int(math.sqrt(serial_seconds / startup)))
+    if workers < 2 or serial_seconds / workers + workers * startup >= serial_seconds:
+        return 1
+    return workers
+
+
+def _page_texts_parallel(pdf_path: str, first: int, page_count: int, workers: int) -> List[str]:
+    """Extract pages [first, page_count) in contiguous ranges across worker processes"""
+    step = -(-(page_count - first) // workers)
+    starts = range(first, page_count, step)
+    stops = [min(start + step, page_count) for start in starts]
+    with ProcessPoolExecutor(max_workers=len(starts), mp_context=get_worker_context()) as executor:
+        page_ranges = executor.map(_page_range_texts_pymupdf, repeat(pdf_path), starts, stops)
+        return list(chain.from_iterable(page_ranges))
+
+
+def _page_texts_pdfplumber(source) -> List[Optional[str]]:
+    """Extract per-page text with pdfplumber"""
+    if _is_pdf_bytes(source):
+        source = io.BytesIO(source)
+    with pdfplumber.open(source) as pdf:
+        return [page.extract_text() for page in pdf.pages]
+
+
+def _match_lines_single_scan(text: str, queries: List[str], case_sensitive: bool) -> Dict[str, Set[int]]:
+    """Find the line numbers each query occurs on with one Aho-Corasick pass"""
+    haystack = text if case_sensitive else text.lower()
+    queries_by_key = defaultdict(list)
+    for query in queries:
+        queries_by_key[query if case_sensitive else query.lower()].append(query)
+    
+    automaton = ahocorasick.Automaton()
+    for key in queries_by_key:
+        automaton.add_word(key, key)
+    automaton.make_automaton()
+    
+    line_starts = get_line_starts(haystack)
+    lines_by_key = defaultdict(set)
+    for end, key in automaton.iter(haystack):
+        lines_by_key[key].add(bisect.bisect_right(line_starts, end - len(key) + 1) - 1)
+    
+    return {query: lines_by_key[key]
+            for key, key_queries in queries_by_key.items() for query in key_queries}
+
+
+def _page_texts(source) -> List[Optional[str]]:
+    """Extract per-page text, preferring PyMuPDF and falling back to pdfplumber"""
+    if pymupdf is not None:
+        try:
+            return _page_texts_pymupdf(source)
+        except Exception:
+            pass
+    return _page_texts_pdfplumber(source)
 
 class PDFProcessor:
     """Handles PDF processing operations including text extraction and search"""
@@ -8,26 +279,76 @@ class PDFProcessor:
     def __init__(self):
         self.current_pdf_path = None
         self.pages_cache = {}
+        # Page spans of the most recently extracted text, so statistics and
+        # chunking can reuse the page boundaries instead of rescanning it
+        self.page_offsets = []
+        self._offsets_text = None
     
     def extract_text(self, pdf_path: str) -> str:
-        """Extract text from PDF file"""
+        """Extract text from PDF file, reusing the on-disk cache while the file is unchanged"""
         try:
-            full_text = ""
-            with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    page_text = page.extract_text()
-                    if page_text:
-                        full_text += f"\n--- Page {page_num + 1} ---\n"
-                        full_text += page_text + "\n"
-                        
-                        # Cache page text for later use
-                        self.pages_cache[page_num] = {
-                            'text': page_text,
-                            'page_num': page_num + 1
-                        }
+            cache_path = _text_cache_path(pdf_path)
+        except OSError:
+            cache_path = None
+        
+        pages = _read_text_cache(cache_path) if cache_path else None
+        if pages is not None:
+            full_text = _join_pages(pages)
+        else:
+            full_text, pages = self._extract_full_text(pdf_path)
+            if cache_path:
+                _write_text_cache(cache_path, pages)
+        
+        self._remember_pages(full_text, pages)
+        self.current_pdf_path = pdf_path
+        return full_text
+    
+    def extract_text_from_bytes(self, pdf_bytes) -> str:
+        """Extract text from an in-memory PDF (bytes or memoryview)"""
+        full_text, pages = self._extract_full_text(pdf_bytes)
+        self._remember_pages(full_text, pages)
+        return full_text
+    
+    def _remember_pages(self, full_text: str, pages: Dict[int, Dict[str, Any]]) -> None:
+        """Cache page text and page boundaries for later use"""
+        self.pages_cache.update(pages)
+        self.page_offsets = _page_offsets(pages)
+        self._offsets_text = full_text
+    
+    def _offsets_for(self, text: str, page_offsets) -> Optional[List[Tuple[int, int, int]]]:
+        """Page spans that describe text: the ones passed in, or those of the text extracted here"""
+        if page_offsets is None and text is self._offsets_text:
+            page_offsets = self.page_offsets
+        # Spans from another text would slice garbage; they must end where the text does
+        if page_offsets and page_offsets[-1][1] == len(text):
+            return page_offsets
+        return None
+    
+    def _page_segments(self, text: str, page_offsets=None) -> List[str]:
+        """Split text at the page markers, slicing by page spans when they are known"""
+        page_offsets = self._offsets_for(text, page_offsets)
+        if page_offsets is None:
+            return text.split('--- Page')
+        
+        # Each segment runs from just past '--- Page' up to the next marker
+        # (including the newline before it), matching text.split('--- Page')
+        marker_len = len('\n--- Page')
+        last = len(page_offsets) - 1
+        return [text[start + marker_len:end + (i < last)]
+                for i, (start, end, _) in enumerate(page_offsets)]
+    
+    def _extract_full_text(self, source) -> Tuple[str, Dict[int, Dict[str, Any]]]:
+        """Extract the full text and per-page entries from a PDF path or in-memory PDF bytes"""
+        try:
+            pages = {}
+            for page_num, page_text in enumerate(_page_texts(source)):
+                if page_text:
+                    pages[page_num] = {
+                        'text': page_text,
+                        'page_num': page_num + 1
+                    }
             
-            self.current_pdf_path = pdf_path
-            return full_text
+            return _join_pages(pages), pages
             
         except Exception as e:
             raise Exception(f"Error extracting text from PDF: {str(e)}")
@@ -36,15 +357,13 @@ class PDFProcessor:
         """Extract text from PDF file page by page"""
         try:
             pages = []
-            with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    page_text = page.extract_text()
-                    if page_text:
-                        pages.append({
-                            'page_num': page_num + 1,
-                            'text': page_text,
-                            'word_count': len(page_text.split())
-                        })
+            for page_num, page_text in enumerate(_page_texts(pdf_path)):
+                if page_text:
+                    pages.append({
+                        'page_num': page_num + 1,
+                        'text': page_text,
+                        'word_count': count_words(page_text)
+                    })
             return pages
             
         except Exception as e:
@@ -52,170 +371,179 @@ class PDFProcessor:
     
     def search_text(self, text: str, query: str, case_sensitive: bool = False) -> List[str]:
         """Search for text within the PDF content"""
-        if not query.strip():
+        if not text or not query.strip():
             return []
         
-        try:
-            # Prepare search parameters
-            search_text = text if case_sensitive else text.lower()
-            search_query = query if case_sensitive else query.lower()
+        # Lines never contain a newline, so such a query cannot match
+        if '\n' in query:
+            return []
+        
+        pattern = _search_pattern(query, case_sensitive)
+        line_starts = get_line_starts(text)
+        line_count = len(line_starts)
+        
+        # Find all matches with context in one regex pass, one result per matching line
+        results = []
+        match = pattern.search(text)
+        while match:
+            line_num = bisect.bisect_right(line_starts, match.start()) - 1
             
-            # Find all matches with context
-            results = []
-            lines = search_text.split('\n')
+            # Get context around the match (3 lines before and after)
+            start_line = max(0, line_num - 3)
+            end_line = min(line_count, line_num + 4)
+            context = get_lines_text(text, line_starts, start_line, end_line)
             
-            for line_num, line in enumerate(lines):
-                if search_query in line:
-                    # Get context around the match (3 lines before and after)
-                    start_line = max(0, line_num - 3)
-                    end_line = min(len(lines), line_num + 4)
-                    
-                    context_lines = lines[start_line:end_line]
-                    context = '\n'.join(context_lines)
-                    
-                    # Highlight the search term in the result
-                    highlighted_context = self._highlight_search_term(context, query, case_sensitive)
-                    results.append(highlighted_context)
+            # Highlight the search term in the result
+            results.append(pattern.sub(r'**\g<0>**', context))
             
+            if line_num + 1 >= line_count:
+                break
+            match = pattern.search(text, line_starts[line_num + 1])
+        
+        return results
+    
+    def search_text_many(self, text: str, queries: List[str],
+                         case_sensitive: bool = False) -> Dict[str, List[str]]:
+        """Search for several queries at once, returning search_text results per query"""
+        results = {query: [] for query in queries}
+        searchable = [query for query in results if query.strip() and '\n' not in query]
+        
+        # Without the automaton (or with a single query) plain per-query scans are as good
+        if ahocorasick is None or len(searchable) < 2:
+            for query in searchable:
+                results[query] = self.search_text(text, query, case_sensitive)
             return results
-            
-        except Exception as e:
-            return []
+        
+        line_starts = get_line_starts(text)
+        line_count = len(line_starts)
+        match_lines = _match_lines_single_scan(text, searchable, case_sensitive)
+        
+        for query, line_nums in match_lines.items():
+            pattern = _search_pattern(query, case_sensitive)
+            results[query] = [
+                pattern.sub(r'**\g<0>**', get_lines_text(
+                    text, line_starts, max(0, line_num - 3), min(line_count, line_num + 4)))
+                for line_num in sorted(line_nums)
+            ]
+        
+        return results
     
     def _highlight_search_term(self, text: str, term: str, case_sensitive: bool = False) -> str:
         """Highlight search term in text"""
-        if case_sensitive:
-            pattern = re.escape(term)
-        else:
-            pattern = re.escape(term)
-            text_to_search = text
-        
         try:
-            if case_sensitive:
-                highlighted = re.sub(
-                    f'({pattern})',
-                    r'**\1**',
-                    text
-                )
-            else:
-                highlighted = re.sub(
-                    f'({pattern})',
-                    r'**\1**',
-                    text,
-                    flags=re.IGNORECASE
-                )
-            return highlighted
+            return _search_pattern(term, case_sensitive).sub(r'**\g<0>**', text)
         except:
             return text
     
     def extract_topics_from_text(self, text: str) -> List[str]:
         """Extract potential topics from text using simple heuristics"""
-        try:
-            topics = []
+        if not text:
+            return []
+        
+        topics = []
+        seen = set()
+        
+        # Look for common topic indicators
+        lines = text.split('\n')
+        
+        for line in lines:
+            line = line.strip()
             
-            # Look for common topic indicators
-            lines = text.split('\n')
+            # Skip empty lines, long lines (never headings) and page markers
+            if not line or len(line) >= 100 or line.startswith('--- Page'):
+                continue
             
-            for line in lines:
-                line = line.strip()
+            # Look for lines that might be headings/topics, cheapest checks first
+            # 1. Lines with specific formatting patterns
+            # 2. Lines that start with numbers or bullets
+            # 3. Short lines (likely titles)
+            if (line.endswith(':') or
+                line.startswith(('Chapter', 'Section', 'Part')) or
+                (line[0].isdigit() and _HEADING_NUM_RE.match(line)) or
+                line.isupper() or
+                len(line.split()) <= 8):
                 
-                # Skip empty lines and page markers
-                if not line or line.startswith('--- Page'):
-                    continue
+                # Clean up the topic
+                topic = _LEAD_NUM_RE.sub('', line) if line[0].isdigit() else line  # Remove leading numbers
+                topic = topic.rstrip(':')  # Remove trailing colons
+                topic = topic.strip()
                 
-                # Look for lines that might be headings/topics
-                # 1. Short lines (likely titles)
-                # 2. Lines with specific formatting patterns
-                # 3. Lines that start with numbers or bullets
-                
-                if len(line) < 100:  # Potential heading
-                    # Check if it looks like a heading
-                    if (line.isupper() or 
-                        line.startswith(('Chapter', 'Section', 'Part')) or
-                        re.match(r'^\d+\.?\s+[A-Z]', line) or
-                        line.endswith(':') or
-                        len(line.split()) <= 8):
-                        
-                        # Clean up the topic
-                        topic = re.sub(r'^\d+\.?\s*', '', line)  # Remove leading numbers
-                        topic = topic.rstrip(':')  # Remove trailing colons
-                        topic = topic.strip()
-                        
-                        if len(topic) > 2 and topic not in topics:
-                            topics.append(topic)
-            
-            return topics[:20]  # Return top 20 potential topics
-            
-        except Exception as e:
-            return []
+                if len(topic) > 2 and topic not in seen:
+                    seen.add(topic)
+                    topics.append(topic)
+                    if len(topics) == 20:  # Return top 20 potential topics
+                        break
+        
+        return topics
     
-    def split_text_into_chunks(self, text: str, chunk_size: int = 2000) -> List[str]:
-        """Split text into smaller chunks for better display"""
+    def split_text_into_chunks(self, text: str, chunk_size: int = 2000,
+                               page_offsets: Optional[List[Tuple[int, int, int]]] = None) -> List[str]:
+        """Split text into smaller chunks for better display
+        
+        page_offsets are the spans recorded when text was extracted (see
+        page_offsets); passing them avoids rescanning text for page markers.
+        """
         if not text:
             return []
         
-        try:
-            # Split by pages first
-            pages = text.split('--- Page')
-            chunks = []
+        # Split by pages first
+        pages = self._page_segments(text, page_offsets)
+        chunks = []
+        
+        for page in pages:
+            if not page.strip():
+                continue
             
-            for page in pages:
-                if not page.strip():
-                    continue
-                
-                # If page is small enough, add as single chunk
-                if len(page) <= chunk_size:
-                    chunks.append(page.strip())
-                else:
-                    # Split large pages into smaller chunks
-                    words = page.split()
-                    current_chunk = []
-                    current_length = 0
+            # If page is small enough, add as single chunk
+            if len(page) <= chunk_size:
+                chunks.append(page.strip())
+            else:
+                # Split large pages into chunks of at most chunk_size characters by
+                # slicing, breaking at the last space or newline so words stay whole
+                page = page.strip()
+                page_len = len(page)
+                start = 0
+                while True:
+                    end = start + chunk_size
+                    if end >= page_len:
+                        end = page_len
+                    else:
+                        end = max(page.rfind(' ', start, end + 1), page.rfind('\n', start, end + 1))
+                        if end <= start:  # a single word longer than chunk_size
+                            match = _WHITESPACE_RE.search(page, start)
+                            end = match.start() if match else page_len
                     
-                    for word in words:
-                        word_length = len(word) + 1  # +1 for space
-                        
-                        if current_length + word_length > chunk_size and current_chunk:
-                            chunks.append(' '.join(current_chunk))
-                            current_chunk = [word]
-                            current_length = word_length
-                        else:
-                            current_chunk.append(word)
-                            current_length += word_length
+                    chunks.append(page[start:end].rstrip())
                     
-                    if current_chunk:
-                        chunks.append(' '.join(current_chunk))
-            
-            return chunks if chunks else [text]
-            
-        except Exception as e:
-            return [text]
+                    match = _NON_SPACE_RE.search(page, end)
+                    if not match:
+                        break
+                    start = match.start()
+        
+        return chunks if chunks else [text]
     
-    def get_text_statistics(self, text: str) -> Dict[str, Any]:
+    def get_text_statistics(self, text: str,
+                            page_offsets: Optional[List[Tuple[int, int, int]]] = None) -> Mapping[str, Any]:
         """Get basic statistics about the text"""
-        try:
-            words = text.split()
-            lines = text.split('\n')
-            
-            # Count pages
+        if not text:
+            return _EMPTY_TEXT_STATS
+        
+        word_count = count_words(text)
+        
+        # Count pages
+        page_offsets = self._offsets_for(text, page_offsets)
+        if page_offsets is not None:
+            page_count = len(page_offsets)
+        else:
             page_count = text.count('--- Page')
-            
-            # Estimate reading time (average 200 words per minute)
-            reading_time_minutes = len(words) / 200
-            
-            return {
-                'word_count': len(words),
-                'character_count': len(text),
-                'line_count': len(lines),
-                'page_count': page_count,
-                'estimated_reading_time': f"{reading_time_minutes:.1f} minutes"
-            }
-            
-        except Exception as e:
-            return {
-                'word_count': 0,
-                'character_count': 0,
-                'line_count': 0,
-                'page_count': 0,
-                'estimated_reading_time': "Unknown"
-            }
+        
+        # Estimate reading time (average 200 words per minute)
+        reading_time_minutes = word_count / 200
+        
+        return {
+            'word_count': word_count,
+            'character_count': len(text),
+            'line_count': text.count('\n') + 1,
+            'page_count': page_count,
+            'estimated_reading_time': f"{reading_time_minutes:.1f} minutes"
+        }
@@ -1,5 +1,14 @@
 import os
-from typing import Dict, Any
+import bisect
+import functools
+import multiprocessing
+import re
+import time
+import numpy as np
+import orjson
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping
 
 def create_directories():
     """Create necessary directories for the application"""
@@ -13,8 +22,9 @@ def create_directories():
     for directory in directories:
         os.makedirs(directory, exist_ok=True)
 
+@functools.cache
 def get_color_options() -> Dict[str, Dict[str, str]]:
-    """Get available highlight color options"""
+    """Get available highlight color options (shared, treat as read-only)"""
     return {
         'Light Green': {
             'hex': '#90EE90',
@@ -38,24 +48,29 @@ def get_color_options() -> Dict[str, Dict[str, str]]:
         }
     }
 
+_UNSAFE_CHARS_RE = re.compile(r'[^\w\-_\.]')
+_MULTI_UNDERSCORE_RE = re.compile(r'_+')
+
 def clean_filename(filename: str) -> str:
     """Clean filename for safe file system operations"""
-    import re
     # Remove or replace unsafe characters
-    cleaned = re.sub(r'[^\w\-_\.]', '_', filename)
+    cleaned = _UNSAFE_CHARS_RE.sub('_', filename)
     # Remove multiple underscores
-    cleaned = re.sub(r'_+', '_', cleaned)
+    cleaned = _MULTI_UNDERSCORE_RE.sub('_', cleaned)
     # Remove leading/trailing underscores
     cleaned = cleaned.strip('_')
     return cleaned
 
-def format_timestamp(timestamp_str: str) -> str:
-    """Format timestamp string for display"""
+TIMESTAMP_DISPLAY_FORMAT = '%B %d, %Y at %I:%M %p'
+
+@functools.lru_cache(maxsize=4096)
+def format_timestamp(timestamp_str: str, fmt: str = TIMESTAMP_DISPLAY_FORMAT) -> str:
+    """Format timestamp string for display (memoized per string and format)"""
     try:
-        from datetime import datetime
-        dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-        return dt.strftime('%B %d, %Y at %I:%M %p')
-    except:
+        if timestamp_str.endswith('Z'):
+            timestamp_str = timestamp_str[:-1] + '+00:00'
+        return datetime.fromisoformat(timestamp_str).strftime(fmt)
+    except Exception:
         return 'Unknown time'
 
 def truncate_text(text: str, max_length: int = 100) -> str:
@@ -64,9 +79,38 @@ def truncate_text(text: str, max_length: int = 100) -> str:
         return text
     return text[:max_length] + "..."
 
-def validate_pdf_file(file_path: str) -> bool:
-    """Validate if file is a valid PDF"""
+@functools.lru_cache(maxsize=256)
+def _stat_cached(file_path: str, second: int) -> os.stat_result:
+    """os.stat memoized per path and monotonic second"""
+    return os.stat(file_path)
+
+def _stat(file_path: str) -> os.stat_result:
+    """Stat a file, sharing the result between calls on the same path within a second"""
+    return _stat_cached(file_path, int(time.monotonic()))
+
+def validate_pdf_file(file_path: str, strict: bool = False) -> bool:
+    """Validate if file is a valid PDF
+    
+    By default this sniffs the '%PDF-' header and an '%%EOF' marker in the
+    last KiB, which rejects non-PDFs and truncated files without parsing.
+    strict=True additionally opens the file with pdfplumber and requires a page.
+    """
     try:
+        # An empty file can never be a PDF; skip the parse entirely
+        size = _stat(file_path).st_size
+        if size == 0:
+            return False
+        
+        with open(file_path, 'rb') as f:
+            if not f.read(8).startswith(b'%PDF-'):
+                return False
+            f.seek(max(size - 1024, 0))
+            if b'%%EOF' not in f.read():
+                return False
+        
+        if not strict:
+            return True
+        
         import pdfplumber
         with pdfplumber.open(file_path) as pdf:
             # Try to get first page to validate
@@ -79,42 +123,90 @@ def validate_pdf_file(file_path: str) -> bool:
 def get_file_size_mb(file_path: str) -> float:
     """Get file size in MB"""
     try:
-        size_bytes = os.path.getsize(file_path)
+        size_bytes = _stat(file_path).st_size
         size_mb = size_bytes / (1024 * 1024)
         return round(size_mb, 2)
     except:
         return 0.0
 
+def get_worker_context():
+    """Multiprocessing context for worker pools: forkserver where available, else spawn.
+
+    Never fork: the host (the Streamlit server) is multithreaded.
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+_NEWLINE_RE = re.compile('\n')
+
+def get_line_starts(text: str) -> List[int]:
+    """Return the offset at which each line of text begins"""
+    return [0, *(match.end() for match in _NEWLINE_RE.finditer(text))]
+
+def get_lines_text(text: str, line_starts: List[int], start: int, end: int) -> str:
+    """Return lines [start, end) of text without the trailing newline"""
+    if end < len(line_starts):
+        return text[line_starts[start]:line_starts[end] - 1]
+    return text[line_starts[start]:]
+
+# Below this size str.split() beats the array setup cost
+_VECTOR_WORD_COUNT_MIN_CHARS = 4096
+
+# Lookup table of the code points str.split() treats as whitespace (all are <= U+3000)
+_WHITESPACE_TABLE = np.array([chr(c).isspace() for c in range(0x3001)], dtype=bool)
+
+def count_words(text: str) -> int:
+    """Count whitespace-separated words like len(text.split()) without building the list"""
+    if len(text) < _VECTOR_WORD_COUNT_MIN_CHARS:
+        return len(text.split())
+    
+    if text.isascii():
+        codes = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+        is_space = _WHITESPACE_TABLE[codes]
+    else:
+        # surrogatepass: lone surrogates (never whitespace) must not abort the count
+        codes = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        is_space = _WHITESPACE_TABLE[np.minimum(codes, 0x3000)] & (codes <= 0x3000)
+    
+    # A word starts at every non-space character that follows a space (or begins the text)
+    return int(not is_space[0]) + int(np.count_nonzero(is_space[:-1] & ~is_space[1:]))
+
 def search_text_with_context(text: str, query: str, context_lines: int = 3) -> list:
     """Search text and return results with context"""
-    if not query.strip():
+    if not query.strip() or '\n' in query:
         return []
     
     results = []
-    lines = text.split('\n')
-    query_lower = query.lower()
+    line_starts = get_line_starts(text)
+    line_count = len(line_starts)
+    pattern = re.compile(re.escape(query), re.IGNORECASE)
     
-    for i, line in enumerate(lines):
-        if query_lower in line.lower():
-            # Get context
-            start = max(0, i - context_lines)
-            end = min(len(lines), i + context_lines + 1)
-            
-            context = lines[start:end]
-            context_text = '\n'.join(context)
-            
-            # Highlight the search term
-            highlighted_line = line.replace(
-                query, 
-                f"**{query}**"
-            )
-            context[i - start] = highlighted_line
-            
-            results.append({
-                'line_number': i + 1,
-                'context': '\n'.join(context),
-                'highlighted_line': highlighted_line
-            })
+    # One regex pass over the whole text; resume at the next line after each hit
+    match = pattern.search(text)
+    while match:
+        i = bisect.bisect_right(line_starts, match.start()) - 1
+        
+        # Get context
+        start = max(0, i - context_lines)
+        end = min(line_count, i + context_lines + 1)
+        context = get_lines_text(text, line_starts, start, end).split('\n')
+        
+        # Highlight the search term
+        highlighted_line = context[i - start].replace(
+            query, 
+            f"**{query}**"
+        )
+        context[i - start] = highlighted_line
+        
+        results.append({
+            'line_number': i + 1,
+            'context': '\n'.join(context),
+            'highlighted_line': highlighted_line
+        })
+        
+        if i + 1 >= line_count:
+            break
+        match = pattern.search(text, line_starts[i + 1])
     
     return results
 
@@ -122,9 +214,6 @@ def export_annotations_json(pdf_name: str, annotations: Dict[str, Any],
                            topics: Dict[str, Any]) -> str:
     """Export annotations to JSON file"""
     try:
-        import json
-        from datetime import datetime
-        
         export_data = {
             'pdf_name': pdf_name,
             'export_date': datetime.now().isoformat(),
@@ -136,8 +225,8 @@ def export_annotations_json(pdf_name: str, annotations: Dict[str, Any],
         export_filename = f"annotations_export_{clean_name}.json"
         export_path = os.path.join("notes_output", export_filename)
         
-        with open(export_path, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, indent=2, ensure_ascii=False)
+        with open(export_path, 'wb') as f:
+            f.write(orjson.dumps(export_data, option=orjson.OPT_INDENT_2))
         
         return export_path
     except Exception as e:
@@ -147,10 +236,8 @@ def export_annotations_json(pdf_name: str, annotations: Dict[str, Any],
 def import_annotations_json(import_path: str) -> tuple:
     """Import annotations from JSON file"""
     try:
-        import json
-        
-        with open(import_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(import_path, 'rb') as f:
+            data = orjson.loads(f.read())
         
         pdf_name = data.get('pdf_name', 'Unknown')
         annotations = {pdf_name: data.get('annotations', {})}
@@ -161,32 +248,48 @@ def import_annotations_json(import_path: str) -> tuple:
         print(f"Error importing annotations: {e}")
         return None, {}, {}
 
-def get_reading_statistics(text: str) -> Dict[str, Any]:
+# One match per '.'-separated segment that holds a non-whitespace character
+_SENTENCE_RE = re.compile(r'[^.\s][^.]*')
+_NON_SPACE_RE = re.compile(r'\S')
+
+def _count_paragraphs(text: str) -> int:
+    """Count non-blank segments between '\n\n' separators without splitting the text"""
+    count = 0
+    start = 0
+    while True:
+        end = text.find('\n\n', start)
+        if end == -1:
+            return count + bool(_NON_SPACE_RE.search(text, start))
+        count += bool(_NON_SPACE_RE.search(text, start, end))
+        start = end + 2
+
+# Reading statistics of empty text, shared read-only instead of rebuilt on every call
+_EMPTY_READING_STATS = MappingProxyType({
+    'word_count': 0,
+    'sentence_count': 0,
+    'paragraph_count': 0,
+    'character_count': 0,
+    'character_count_no_spaces': 0,
+    'estimated_reading_time_minutes': 0.0,
+    'estimated_reading_time_formatted': '0 min 0 sec'
+})
+
+def get_reading_statistics(text: str) -> Mapping[str, Any]:
     """Get reading statistics for text"""
-    try:
-        words = text.split()
-        sentences = text.split('.')
-        paragraphs = text.split('\n\n')
-        
-        # Estimate reading time (average 200 words per minute)
-        reading_time_minutes = len(words) / 200
-        
-        return {
-            'word_count': len(words),
-            'sentence_count': len([s for s in sentences if s.strip()]),
-            'paragraph_count': len([p for p in paragraphs if p.strip()]),
-            'character_count': len(text),
-            'character_count_no_spaces': len(text.replace(' ', '')),
-            'estimated_reading_time_minutes': round(reading_time_minutes, 1),
-            'estimated_reading_time_formatted': f"{int(reading_time_minutes)} min {int((reading_time_minutes % 1) * 60)} sec"
-        }
-    except Exception as e:
-        return {
-            'word_count': 0,
-            'sentence_count': 0, 
-            'paragraph_count': 0,
-            'character_count': 0,
-            'character_count_no_spaces': 0,
-            'estimated_reading_time_minutes': 0,
-            'estimated_reading_time_formatted': '0 min 0 sec'
-        }
+    if not text:
+        return _EMPTY_READING_STATS
+    
+    word_count = count_words(text)
+    
+    # Estimate reading time (average 200 words per minute)
+    reading_time_minutes = word_count / 200
+    
+    return {
+        'word_count': word_count,
+        'sentence_count': sum(1 for _ in _SENTENCE_RE.finditer(text)),
+        'paragraph_count': _count_paragraphs(text),
+        'character_count': len(text),
+        'character_count_no_spaces': len(text) - text.count(' '),
+        'estimated_reading_time_minutes': round(reading_time_minutes, 1),
+        'estimated_reading_time_formatted': f"{int(reading_time_minutes)} min {int((reading_time_minutes % 1) * 60)} sec"
+    }